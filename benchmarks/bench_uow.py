@@ -0,0 +1,86 @@
+# Copyright (c) 2025 Maxim Ivanov
+# SPDX-License-Identifier: MIT
+
+"""Micro-benchmarks for UnitOfWork overhead
+
+Run with ``make benchmark``. Times are the best of several runs,
+in microseconds per call. An empty transaction must stay the cheapest
+case: it should never touch the repositories.
+"""
+
+from __future__ import annotations
+
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from unitofwork import UnitOfWork
+
+
+class DictRepo:
+    def __init__(self) -> None:
+        self._items: dict[int, Any] = {}
+
+    def checkpoint(self) -> dict[int, Any]:
+        return self._items.copy()
+
+    def restore(self, snapshot: dict[int, Any]) -> None:
+        self._items = snapshot
+
+    def commit(self) -> None:
+        pass
+
+
+def construct() -> None:
+    UnitOfWork(repo1, repo2)
+
+
+def empty_transaction() -> None:
+    with UnitOfWork(repo1, repo2):
+        pass
+
+
+def one_operation() -> None:
+    with UnitOfWork(repo1, repo2, repo3) as uow:
+        uow.register_operation(int)
+
+
+def one_operation_reused() -> None:
+    reused.reset()
+    with reused as uow:
+        uow.register_operation(int)
+
+
+def many_operations() -> None:
+    with UnitOfWork(repo1) as uow:
+        for _ in range(1000):
+            uow.register_operation(int)
+
+
+def many_operations_without_repos() -> None:
+    with UnitOfWork() as uow:
+        for _ in range(1000):
+            uow.register_operation(int)
+
+
+repo1, repo2, repo3 = DictRepo(), DictRepo(), DictRepo()
+reused = UnitOfWork(repo1, repo2, repo3)
+
+BENCHMARKS: list[tuple[str, Callable[[], None], int]] = [
+    ('construct, 2 repos', construct, 100_000),
+    ('empty transaction, 2 repos', empty_transaction, 100_000),
+    ('1 operation, 3 repos', one_operation, 100_000),
+    ('1 operation, 3 repos, reset', one_operation_reused, 100_000),
+    ('1000 operations, 1 repo', many_operations, 300),
+    ('1000 operations, no repos', many_operations_without_repos, 300),
+]
+
+
+def main() -> None:
+    for name, func, number in BENCHMARKS:
+        best = min(timeit.repeat(func, number=number, repeat=7))
+        print(f'{name:32s} {best / number * 1e6:10.3f} us')
+
+
+if __name__ == '__main__':
+    main()
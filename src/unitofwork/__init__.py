@@ -3,9 +3,14 @@
 
 import logging
 
-from .interfaces import SupportsRollback
+from .cow import CoWRepoMixin
+from .interfaces import (
+    SupportsCoWRollback,
+    SupportsRollback,
+    SupportsVersionedRollback,
+)
 from .sql_uow import SqlUnitOfWork
-from .uow import RollbackError, UnitOfWork, UnitOfWorkError
+from .uow import NoopOperation, RollbackError, UnitOfWork, UnitOfWorkError
 
 
 # Set up null handler for the library's logger
@@ -14,9 +19,13 @@ logger.addHandler(logging.NullHandler())
 
 
 __all__ = [
+    'CoWRepoMixin',
+    'NoopOperation',
     'RollbackError',
     'SqlUnitOfWork',
+    'SupportsCoWRollback',
     'SupportsRollback',
+    'SupportsVersionedRollback',
     'UnitOfWork',
     'UnitOfWorkError',
 ]
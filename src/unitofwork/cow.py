@@ -0,0 +1,44 @@
+# Copyright (c) 2025 Maxim Ivanov
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+
+__all__ = [
+    'CoWRepoMixin',
+]
+
+
+class CoWRepoMixin[K, V]:
+    """Mixin for dict-backed repositories with copy-on-write snapshots
+
+    Checkpoint shares ``self._items`` with the snapshot instead of copying it.
+    The dict is copied once, on the first write after the checkpoint,
+    so read-only transactions never pay for the copy.
+    Mutating methods must call ``self._ensure_writable()``
+    before modifying ``self._items``.
+    """
+
+    def __init__(self) -> None:
+        self._items: dict[K, V] = {}
+        self._shared = False
+
+    def checkpoint(self) -> dict[K, V]:
+        return self._items.copy()
+
+    def checkpoint_cow(self) -> dict[K, V]:
+        self._shared = True
+        return self._items
+
+    def restore(self, snapshot: dict[K, V]) -> None:
+        # The snapshot may still be referenced by another unit of work
+        self._items = snapshot
+        self._shared = True
+
+    def commit(self) -> None:
+        pass
+
+    def _ensure_writable(self) -> None:
+        if self._shared:
+            self._items = self._items.copy()
+            self._shared = False
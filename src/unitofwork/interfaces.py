@@ -5,12 +5,21 @@ from typing import Any, Protocol
 
 
 __all__ = [
+    'SupportsCoWRollback',
     'SupportsRollback',
+    'SupportsVersionedRollback',
 ]
 
 
 class SupportsRollback(Protocol):
-    """Protocol for repositories that support rollback functionality"""
+    """Protocol for repositories that support rollback functionality
+
+    A repository whose ``restore`` waits on I/O (e.g. a remote database)
+    may set the class attribute ``__uow_io_bound__ = True``.
+    When several such repositories roll back together, UnitOfWork
+    restores them concurrently in a thread pool, so ``restore``
+    must be safe to call from another thread.
+    """
 
     def checkpoint(self) -> Any:
         """Return a snapshot of the current state."""
@@ -21,5 +30,45 @@ class SupportsRollback(Protocol):
         pass
 
     def commit(self) -> None:
-        """Commit transaction, used in UnitOfWork."""
+        """Commit transaction, used in UnitOfWork.
+
+        Called once the operations of a transaction succeed,
+        even if no snapshot was taken for it.
+        Optional: UnitOfWork skips repositories that do not define it.
+        """
+        pass
+
+
+class SupportsCoWRollback(SupportsRollback, Protocol):
+    """Protocol for repositories with copy-on-write snapshots
+
+    UnitOfWork prefers ``checkpoint_cow`` over ``checkpoint``
+    when a repository provides it.
+    """
+
+    def checkpoint_cow(self) -> Any:
+        """Return the current state by reference.
+
+        The repository must copy its state before the next mutation,
+        so that the returned snapshot stays intact.
+        """
+        pass
+
+
+class SupportsVersionedRollback(Protocol):
+    """Protocol for repositories that rewind to a version number
+
+    UnitOfWork prefers it over ``checkpoint`` and ``restore``:
+    the snapshot is a single integer instead of a copy of the state.
+    As with ``SupportsRollback``, ``commit`` is optional.
+    ``rewind_to`` must be defined on the class: an instance attribute,
+    or one answered by ``__getattr__``, does not opt in.
+    """
+
+    def version(self) -> int:
+        """Return the current version, increasing with every change."""
+        pass
+
+    def rewind_to(self, version: int) -> None:
+        """Undo all changes made after the given version."""
         pass
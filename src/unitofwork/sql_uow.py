@@ -4,8 +4,10 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable
 from typing import Any, Protocol
 
+from .interfaces import SupportsRollback, SupportsVersionedRollback
 from .uow import UnitOfWork
 
 
@@ -36,8 +38,20 @@ class SqlUnitOfWork:
         self._connection = connection
         self._should_commit = False
 
-    def register_operation(self, operation) -> None:
-        return self._base_uow.register_operation(operation)
+    def register_operation(
+        self,
+        operation: Callable[[], Any],
+        undo: Callable[[], Any] | None = None,
+    ) -> None:
+        self._base_uow.register_operation(operation, undo)
+
+    def mark_dirty(self) -> None:
+        self._base_uow.mark_dirty()
+
+    def reset(
+        self, *repositories: SupportsRollback | SupportsVersionedRollback
+    ) -> None:
+        self._base_uow.reset(*repositories)
 
     def __enter__(self) -> SqlUnitOfWork:
         if not self._connection.in_transaction():
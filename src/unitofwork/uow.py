@@ -3,17 +3,24 @@
 
 from __future__ import annotations
 
+import inspect
 import logging
 from collections.abc import Callable
-from contextlib import AbstractContextManager
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum, auto
-from types import TracebackType
-from typing import Any, Literal, final
+from functools import cache
+from operator import methodcaller
+from types import FunctionType, TracebackType
+from typing import Any, Literal, NamedTuple, final
 
-from .interfaces import SupportsRollback
+from .interfaces import (
+    SupportsRollback,
+    SupportsVersionedRollback,
+)
 
 
 __all__ = [
+    'NoopOperation',
     'RollbackError',
     'UnitOfWork',
     'UnitOfWorkError',
@@ -21,6 +28,20 @@ __all__ = [
 
 logger = logging.getLogger(__name__)
 
+_Repository = SupportsRollback | SupportsVersionedRollback
+
+# Above this many repositories, _unique looks them up by id
+_UNIQUE_SCAN_LIMIT = 8
+
+# Stands in for the snapshot of a repository whose checkpoint failed
+_NO_SNAPSHOT = object()
+
+
+@cache
+def _io_executor() -> ThreadPoolExecutor:
+    """Return the shared pool for restoring I/O-bound repositories"""
+    return ThreadPoolExecutor(thread_name_prefix='unitofwork')
+
 
 class UnitOfWorkState(Enum):
     INITIAL = auto()
@@ -36,80 +57,401 @@ class UnitOfWorkError(Exception):
 
 
 class RollbackError(UnitOfWorkError):
-    """Exception raised when rollback fails"""
+    """Exception raised when rollback fails
+
+    Each failure pairs the repository that failed to restore,
+    or the undo callable that failed, with the raised exception.
+    """
 
     def __init__(
-        self, message: str, failures: list[tuple[SupportsRollback, Exception]]
+        self,
+        message: str,
+        failures: list[tuple[_Repository | Callable[[], Any], Exception]],
     ):
         super().__init__(message)
         self.failures = failures
 
 
 @final
-class UnitOfWork(AbstractContextManager['UnitOfWork']):
-    def __init__(self, *repositories: SupportsRollback):
+class NoopOperation:
+    """Operation that does not change any state
+
+    Inside the context, ``register_operation`` skips it: it is neither
+    stored nor executed, and does not trigger snapshots.
+    Outside of the context it is executed immediately, as usual.
+    """
+
+    __slots__ = ('_operation',)
+
+    def __init__(self, operation: Callable[[], Any]):
+        self._operation = operation
+
+    def __call__(self) -> Any:
+        return self._operation()
+
+
+def _unique(
+    repositories: tuple[_Repository, ...],
+) -> tuple[_Repository, ...]:
+    """Drop repeated repositories, keeping the first occurrence
+
+    Repositories are compared by identity, as they may be unhashable.
+    """
+    count = len(repositories)
+    # Most transactions use two or three repositories:
+    # comparing them pairwise is cheaper than any loop
+    if count == 3:
+        first, second, third = repositories
+        if first is not second and first is not third and second is not third:
+            return repositories
+    elif count == 2:
+        if repositories[0] is not repositories[1]:
+            return repositories
+    elif count < 2:
+        return repositories
+
+    if count <= _UNIQUE_SCAN_LIMIT:
+        # Scanning a few repositories is cheaper than building a dict
+        unique: list[_Repository] = []
+        for repo in repositories:
+            for seen in unique:
+                if seen is repo:
+                    break
+            else:
+                unique.append(repo)
+        return tuple(unique)
+
+    by_id: dict[int, _Repository] = {}
+    for repo in repositories:
+        by_id.setdefault(id(repo), repo)
+    return tuple(by_id.values())
+
+
+class _Methods(NamedTuple):
+    """Methods UnitOfWork calls on a repository, taking it as argument"""
+
+    checkpoint: Callable[[Any], Any]
+    restore: Callable[[Any, Any], Any]
+    commit: Callable[[Any], Any]
+
+
+# Resolved once per repository class rather than per transaction.
+# A dict per method keeps the lookup in the hot loops to one subscript
+_checkpoint_by_type: dict[type, Callable[[Any], Any]] = {}
+_restore_by_type: dict[type, Callable[[Any, Any], Any]] = {}
+_commit_by_type: dict[type, Callable[[Any], Any]] = {}
+
+# Mock creates a class per instance, so the cache is bounded
+_METHODS_CACHE_LIMIT = 256
+
+
+def _resolve_methods(cls: type) -> _Methods:
+    """Pick the cheapest way to snapshot and restore a repository class
+
+    Optional methods are looked up on the class, which is cheaper than
+    a failing lookup on the instance and ignores mocks and proxies
+    answering any attribute through __getattr__.
+    """
+    if getattr(cls, 'rewind_to', None) is not None:
+        checkpoint, restore = 'version', 'rewind_to'
+    elif getattr(cls, 'checkpoint_cow', None) is not None:
+        checkpoint, restore = 'checkpoint_cow', 'restore'
+    else:
+        checkpoint, restore = 'checkpoint', 'restore'
+
+    commit: Callable[[Any], Any] = _no_commit
+    if (
+        inspect.getattr_static(cls, 'commit', None) is not None
+        or getattr(cls, '__getattr__', None) is not None
+    ):
+        commit = _function(cls, 'commit', _commit_if_defined)
+
+    methods = _Methods(
+        _function(cls, checkpoint, methodcaller(checkpoint)),
+        _function(cls, restore, _call_method(restore)),
+        commit,
+    )
+    if len(_checkpoint_by_type) < _METHODS_CACHE_LIMIT:
+        _checkpoint_by_type[cls] = methods.checkpoint
+        _restore_by_type[cls] = methods.restore
+        _commit_by_type[cls] = methods.commit
+    return methods
+
+
+def _function(
+    cls: type, name: str, fallback: Callable[..., Any]
+) -> Callable[..., Any]:
+    """Return the plain function defining a method of the class
+
+    Calling it with the instance skips creating a bound method.
+    Anything else, such as methods answered by __getattr__,
+    is looked up on the instance by ``fallback``.
+    """
+    function = inspect.getattr_static(cls, name, None)
+    if isinstance(function, FunctionType):
+        return function
+    return fallback
+
+
+def _call_method(name: str) -> Callable[[Any, Any], Any]:
+    def call(repo: Any, arg: Any) -> Any:
+        return getattr(repo, name)(arg)
+
+    return call
+
+
+def _no_commit(repo: Any) -> None:
+    pass
+
+
+def _commit_if_defined(repo: Any) -> None:
+    commit = getattr(repo, 'commit', None)
+    if commit is not None:
+        commit()
+
+
+@final
+class UnitOfWork:
+    __slots__ = (
+        '_distinct',
+        '_operations',
+        '_register',
+        '_repositories',
+        '_snap_states',
+        '_state',
+        '_undos',
+    )
+
+    def __init__(self, *repositories: _Repository):
+        # Kept lean: a transaction that registers nothing
+        # must cost no more than before snapshots became lazy
         self._operations: list[Callable[[], Any]] = []
-        self._snapshots: list[tuple[SupportsRollback, Any]] = []
+        # Undo callables by operation index, created with the first one
+        self._undos: dict[int, Callable[[], Any]] | None = None
+        # Snapshot states, parallel to repositories; None until taken
+        self._snap_states: list[Any] | None = None
+        # Repeated repositories are dropped on first use
+        self._distinct = False
         self._state = UnitOfWorkState.INITIAL
+        self._register: _Register = _register_immediate
         self._repositories = repositories
 
-    def register_operation(self, operation: Callable[[], Any]) -> None:
-        if self._state in (
-            UnitOfWorkState.COMMITTED,
-            UnitOfWorkState.ROLLED_BACK,
-        ):
-            raise UnitOfWorkError(
-                f'Cannot register operation in state: {self._state}'
-            )
+    def register_operation(
+        self,
+        operation: Callable[[], Any],
+        undo: Callable[[], Any] | None = None,
+    ) -> None:
+        """Register operation to be executed on commit
+
+        If ``undo`` is given, it reverts the operation on rollback,
+        and repositories are not snapshotted for this operation.
+        Outside of the context the operation is executed immediately.
+        Inside the context, operations wrapped in ``NoopOperation``
+        are skipped as they do not change any state.
+        """
+        # Dispatches to one of the _register_* functions below,
+        # set along with the state, instead of checking the state on each call
+        self._register(self, operation, undo)
+
+    def _register_immediate(
+        self,
+        operation: Callable[[], Any],
+        undo: Callable[[], Any] | None,
+    ) -> None:
+        operation()
 
-        if self._state == UnitOfWorkState.INITIAL:
-            operation()
+    def _register_deferred(
+        self,
+        operation: Callable[[], Any],
+        undo: Callable[[], Any] | None,
+    ) -> None:
+        if type(operation) is NoopOperation:
+            # Does not change any state, nothing to defer or undo.
+            # An exact type check, unlike a getattr on the operation,
+            # costs next to nothing for the other operations
+            return
+        if undo is None:
+            if self._snap_states is None:
+                # Snapshots are taken lazily, right before the first
+                # operation that cannot be undone otherwise
+                self._take_snapshots()
+        elif self._undos is None:
+            self._undos = {len(self._operations): undo}
         else:
-            self._operations.append(operation)
+            self._undos[len(self._operations)] = undo
+        # The interpreter specializes list.append called in place,
+        # which beats a pre-bound method and keeps construction lean
+        self._operations.append(operation)
+
+    def _register_rejected(
+        self,
+        operation: Callable[[], Any],
+        undo: Callable[[], Any] | None,
+    ) -> None:
+        raise UnitOfWorkError(
+            f'Cannot register operation in state: {self._state}'
+        )
+
+    def mark_dirty(self) -> None:
+        """Take repository snapshots now, unless already taken
+
+        Snapshots are normally deferred until the first operation
+        is registered. Call this before modifying repositories directly
+        inside the context, so that rollback restores them.
+        """
+        if self._state is not UnitOfWorkState.IN_PROGRESS:
+            raise UnitOfWorkError(f'Cannot mark dirty in state: {self._state}')
+
+        if self._snap_states is None:
+            self._take_snapshots()
 
     def _take_snapshots(self) -> None:
         """Take snapshots of all repositories"""
-        self._snapshots.clear()
+        if not self._distinct:
+            self._repositories = _unique(self._repositories)
+            self._distinct = True
+
+        snap_states: list[Any] = []
         for repo in self._repositories:
             try:
-                snapshot = repo.checkpoint()
-                self._snapshots.append((repo, snapshot))
+                checkpoint = _checkpoint_by_type[type(repo)]
+            except KeyError:
+                checkpoint = _resolve_methods(type(repo)).checkpoint
+            try:
+                snap_states.append(checkpoint(repo))
             except Exception as e:
+                snap_states.append(_NO_SNAPSHOT)
                 logger.warning(
                     'Failed to take snapshot for repository %s: %s', repo, e
                 )
+        self._snap_states = snap_states
 
     def commit(self) -> None:
-        if self._state != UnitOfWorkState.IN_PROGRESS:
+        if self._state is not UnitOfWorkState.IN_PROGRESS:
             raise UnitOfWorkError(f'Cannot commit in state: {self._state}')
 
-        try:
-            for operation in self._operations:
-                operation()
-
-            for repo, _ in self._snapshots:
-                repo.commit()
-
+        # Also taken when snapshots are an empty list: with no
+        # repositories, there is nothing to commit or restore
+        if not self._operations and not self._snap_states:
             self._state = UnitOfWorkState.COMMITTED
-            self._cleanup()
+            self._register = _register_rejected
+            return
 
+        executed, error = self._execute()
+        if error is not None:
+            self._rollback(executed)
+            raise UnitOfWorkError('Commit failed, rolled back') from error
+
+        self._state = UnitOfWorkState.COMMITTED
+        self._register = _register_rejected
+        # _cleanup, inlined on the path every transaction takes
+        self._operations.clear()
+        self._snap_states = None
+        self._undos = None
+
+    def _execute(self) -> tuple[int, Exception | None]:
+        """Run operations and commit repositories
+
+        Return the number of executed operations and the first error
+        instead of raising it, so that commit decides how to handle it.
+        """
+        operations = self._operations
+        if not self._distinct:
+            self._repositories = _unique(self._repositories)
+            self._distinct = True
+        executed = 0
+        try:
+            if self._undos is None:
+                # Nothing to undo on failure, so no need to count
+                for operation in operations:
+                    operation()
+            else:
+                # On failure, the index of the failed operation
+                # is the number of operations executed before it
+                for executed, operation in enumerate(operations):  # noqa: B007
+                    operation()
+                executed = len(operations)
+
+            # All repositories are committed, even if they were not
+            # snapshotted because every operation had an undo
+            for repo in self._repositories:
+                try:
+                    commit = _commit_by_type[type(repo)]
+                except KeyError:
+                    commit = _resolve_methods(type(repo)).commit
+                commit(repo)
         except Exception as e:
-            self.rollback()
-            raise UnitOfWorkError('Commit failed, rolled back') from e
+            return executed, e
+        return executed, None
 
     def rollback(self) -> None:
-        if self._state != UnitOfWorkState.IN_PROGRESS:
+        if self._state is not UnitOfWorkState.IN_PROGRESS:
             raise UnitOfWorkError(f'Cannot rollback in state: {self._state}')
 
-        failures: list[tuple[SupportsRollback, Exception]] = []
-        for repo, snapshot in self._snapshots:
+        self._rollback(0)
+
+    def _rollback(self, executed: int) -> None:
+        """Undo the first ``executed`` operations and restore snapshots"""
+        if not self._operations and not self._snap_states:
+            self._state = UnitOfWorkState.ROLLED_BACK
+            self._register = _register_rejected
+            return
+
+        failures: list[tuple[_Repository | Callable[[], Any], Exception]] = []
+
+        # Revert executed operations in reverse order
+        if self._undos is not None:
+            undos = self._undos
+            # Indexes were added in increasing order
+            for index in reversed(undos):
+                if index >= executed:
+                    continue
+                undo = undos[index]
+                try:
+                    undo()
+                except Exception as e:
+                    failures.append((undo, e))
+
+        # I/O-bound repositories are restored concurrently,
+        # unless there is only one of them
+        snapshots = [
+            (repo, snapshot)
+            for repo, snapshot in zip(
+                self._repositories, self._snap_states or ()
+            )
+            if snapshot is not _NO_SNAPSHOT
+        ]
+        io_bound = [
+            getattr(repo, '__uow_io_bound__', False) for repo, _ in snapshots
+        ]
+        concurrent = sum(io_bound) > 1
+        pending: list[tuple[_Repository, Future[Any]]] = []
+        for (repo, snapshot), is_io_bound in zip(snapshots, io_bound):
+            try:
+                restore = _restore_by_type[type(repo)]
+            except KeyError:
+                restore = _resolve_methods(type(repo)).restore
+            try:
+                if concurrent and is_io_bound:
+                    future = _io_executor().submit(restore, repo, snapshot)
+                    pending.append((repo, future))
+                    continue
+                restore(repo, snapshot)
+            except Exception as e:
+                failures.append((repo, e))
+
+        for repo, future in pending:
             try:
-                repo.restore(snapshot)
+                future.result()
             except Exception as e:
                 failures.append((repo, e))
-                logger.error('Failed to restore repository %s: %s', repo, e)
+
+        # Logging is kept out of the loops above
+        for failed, error in failures:
+            logger.error('Failed to roll back %s: %s', failed, error)
 
         self._state = UnitOfWorkState.ROLLED_BACK
+        self._register = _register_rejected
         self._cleanup()
 
         if failures:
@@ -117,17 +459,35 @@ class UnitOfWork(AbstractContextManager['UnitOfWork']):
                 'Failed to restore some repositories', failures
             )
 
+    def reset(self, *repositories: _Repository) -> None:
+        """Make a finished UnitOfWork reusable for another transaction
+
+        Internal buffers are reused, so a long-running worker can keep
+        one instance instead of creating a new one per transaction.
+        Repositories are replaced only if given.
+        """
+        if self._state is UnitOfWorkState.IN_PROGRESS:
+            raise UnitOfWorkError(f'Cannot reset in state: {self._state}')
+
+        self._cleanup()
+        if repositories:
+            self._repositories = repositories
+            self._distinct = False
+        self._state = UnitOfWorkState.INITIAL
+        self._register = _register_immediate
+
     def _cleanup(self) -> None:
         """Clean up internal state"""
         self._operations.clear()
-        self._snapshots.clear()
+        self._snap_states = None
+        self._undos = None
 
     def __enter__(self) -> UnitOfWork:
-        if self._state != UnitOfWorkState.INITIAL:
+        if self._state is not UnitOfWorkState.INITIAL:
             raise UnitOfWorkError('UnitOfWork can only be entered once')
 
         self._state = UnitOfWorkState.IN_PROGRESS
-        self._take_snapshots()
+        self._register = _register_deferred
         return self
 
     def __exit__(
@@ -139,11 +499,12 @@ class UnitOfWork(AbstractContextManager['UnitOfWork']):
         cleanup_error = None
 
         try:
-            if exc_type is not None:
-                if self._state == UnitOfWorkState.IN_PROGRESS:
-                    self.rollback()
-            elif self._state == UnitOfWorkState.IN_PROGRESS:
-                self.commit()
+            if exc_type is None:
+                if self._state is UnitOfWorkState.IN_PROGRESS:
+                    self.commit()
+                return False
+            if self._state is UnitOfWorkState.IN_PROGRESS:
+                self.rollback()
         except Exception as e:
             logger.error('Error during UnitOfWork cleanup: %s', e)
             cleanup_error = e
@@ -166,3 +527,15 @@ class UnitOfWork(AbstractContextManager['UnitOfWork']):
             raise cleanup_error
 
         return False
+
+
+_Register = Callable[
+    [UnitOfWork, Callable[[], Any], Callable[[], Any] | None], None
+]
+
+# Assigned to UnitOfWork._register along with the state.
+# Plain functions rather than bound methods,
+# so that the instance does not reference itself
+_register_immediate: _Register = UnitOfWork._register_immediate
+_register_deferred: _Register = UnitOfWork._register_deferred
+_register_rejected: _Register = UnitOfWork._register_rejected
@@ -0,0 +1,89 @@
+# Copyright (c) 2025 Maxim Ivanov
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import pytest
+
+from unitofwork import CoWRepoMixin, UnitOfWork, UnitOfWorkError
+
+
+class CoWRepo(CoWRepoMixin[str, int]):
+    def add(self, key: str, value: int) -> None:
+        self._ensure_writable()
+        self._items[key] = value
+
+    def list_all(self) -> dict[str, int]:
+        return dict(self._items)
+
+
+def failing_operation() -> None:
+    raise ValueError('Failed')
+
+
+def test_ReadOnlyTransaction_DoesNotCopyItems() -> None:
+    repo = CoWRepo()
+    repo.add('a', 1)
+    items = repo._items
+
+    with UnitOfWork(repo) as uow:
+        uow.mark_dirty()
+        uow.register_operation(lambda: repo.list_all(), undo=lambda: None)
+        assert repo._items is items
+
+    assert repo._items is items
+
+
+def test_WriteAfterCheckpoint_SnapshotIsNotModified() -> None:
+    repo = CoWRepo()
+    repo.add('a', 1)
+
+    snapshot = repo.checkpoint_cow()
+    repo.add('b', 2)
+
+    assert snapshot == {'a': 1}
+    assert repo.list_all() == {'a': 1, 'b': 2}
+
+
+def test_InsideContext_ExecuteOnExit() -> None:
+    repo = CoWRepo()
+
+    with UnitOfWork(repo) as uow:
+        uow.register_operation(lambda: repo.add('a', 1))
+        assert repo.list_all() == {}
+
+    assert repo.list_all() == {'a': 1}
+
+
+def test_TransactionFailure_RepoRestored() -> None:
+    repo = CoWRepo()
+    repo.add('a', 1)
+
+    with pytest.raises(UnitOfWorkError, match='Commit failed, rolled back'):
+        with UnitOfWork(repo) as uow:
+            uow.register_operation(lambda: repo.add('b', 2))
+            uow.register_operation(failing_operation)
+
+    assert repo.list_all() == {'a': 1}
+
+
+def test_WriteAfterRestore_SnapshotIsNotModified() -> None:
+    repo = CoWRepo()
+    snapshot = repo.checkpoint_cow()
+    repo.add('a', 1)
+
+    repo.restore(snapshot)
+    repo.add('b', 2)
+
+    assert snapshot == {}
+    assert repo.list_all() == {'b': 2}
+
+
+def test_Checkpoint_ReturnsCopy() -> None:
+    repo = CoWRepo()
+    repo.add('a', 1)
+
+    snapshot = repo.checkpoint()
+    repo.add('b', 2)
+
+    assert snapshot == {'a': 1}
@@ -252,3 +252,33 @@ def test_CommitActuallyHappensWithoutRollback(
 
             mock_commit.assert_called_once()
             mock_rollback.assert_not_called()
+
+
+def test_Reset_SecondTransactionCommitted(in_memory_db: Connection) -> None:
+    repo = SqlRepositoryUnderTest(in_memory_db)
+    sql_uow = SqlUnitOfWork(UnitOfWork(repo), in_memory_db)
+    id1 = str(uuid4())
+    id2 = str(uuid4())
+
+    with sql_uow as uow:
+        uow.register_operation(lambda: repo.insert_record(id1, 'first'))
+    sql_uow.reset()
+    with sql_uow as uow:
+        uow.register_operation(lambda: repo.insert_record(id2, 'second'))
+
+    assert repo.get_by_id(id1) is not None
+    assert repo.get_by_id(id2) is not None
+
+
+def test_MarkDirtyAndReset_ForwardedToBaseUoW(
+    in_memory_db: Connection,
+) -> None:
+    base_uow = mock.create_autospec(UnitOfWork, instance=True)
+    repo = SqlRepositoryUnderTest(in_memory_db)
+    sql_uow = SqlUnitOfWork(base_uow, in_memory_db)
+
+    sql_uow.mark_dirty()
+    sql_uow.reset(repo)
+
+    base_uow.mark_dirty.assert_called_once_with()
+    base_uow.reset.assert_called_once_with(repo)
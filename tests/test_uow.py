@@ -9,33 +9,46 @@ and should not be used in production code.
 
 from __future__ import annotations
 
-import copy
 import logging
+import threading
 import uuid
+from contextlib import AbstractContextManager
 from dataclasses import dataclass, field
+from typing import Any
 from unittest.mock import Mock
 
 import pytest
 
-from unitofwork import RollbackError, UnitOfWork, UnitOfWorkError
+from unitofwork import (
+    NoopOperation,
+    RollbackError,
+    UnitOfWork,
+    UnitOfWorkError,
+)
 
 
-@dataclass
-class Entity:
-    id_number: uuid.UUID = field(init=False)
+def _new_id() -> bytes:
+    # Raw bytes hash faster and take less memory than UUID objects
+    return uuid.uuid4().bytes
+
+
+def failing_operation() -> None:
+    raise ValueError('Failed')
 
-    def __post_init__(self) -> None:
-        self.id_number = uuid.uuid4()
+
+@dataclass(frozen=True, slots=True)
+class Entity:
+    id_number: bytes = field(default_factory=_new_id, init=False)
 
 
 class FakeRepo:
     def __init__(self) -> None:
-        self._items: dict[uuid.UUID, Entity] = {}
+        self._items: dict[bytes, Entity] = {}
 
-    def checkpoint(self) -> dict[uuid.UUID, Entity]:
-        return copy.deepcopy(self._items)
+    def checkpoint(self) -> dict[bytes, Entity]:
+        return self._items.copy()
 
-    def restore(self, snapshot: dict[uuid.UUID, Entity]) -> None:
+    def restore(self, snapshot: dict[bytes, Entity]) -> None:
         self._items = snapshot
 
     def commit(self) -> None:
@@ -44,12 +57,63 @@ class FakeRepo:
     def add(self, entity: Entity) -> None:
         self._items[entity.id_number] = entity
 
+    def remove(self, entity: Entity) -> None:
+        del self._items[entity.id_number]
+
+    def list_all(self) -> list[Entity]:
+        return list(self._items.values())
+
+
+class RepoWithoutCommit:
+    def __init__(self) -> None:
+        self._items: dict[bytes, Entity] = {}
+
+    def checkpoint(self) -> dict[bytes, Entity]:
+        return self._items.copy()
+
+    def restore(self, snapshot: dict[bytes, Entity]) -> None:
+        self._items = snapshot
+
+    def add(self, entity: Entity) -> None:
+        self._items[entity.id_number] = entity
+
     def list_all(self) -> list[Entity]:
         return list(self._items.values())
 
 
+class IoBoundRepo(FakeRepo):
+    __uow_io_bound__ = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.restored_in: str | None = None
+
+    def restore(self, snapshot: dict[bytes, Entity]) -> None:
+        self.restored_in = threading.current_thread().name
+        super().restore(snapshot)
+
+
+class VersionedRepo:
+    """Append-only repository that rewinds by truncating its log"""
+
+    def __init__(self) -> None:
+        self._log: list[Entity] = []
+
+    def version(self) -> int:
+        return len(self._log)
+
+    def rewind_to(self, version: int) -> None:
+        del self._log[version:]
+
+    def add(self, entity: Entity) -> None:
+        self._log.append(entity)
+
+    def list_all(self) -> list[Entity]:
+        return list(self._log)
+
+
 class FailingToRestoreRepo(FakeRepo):
-    def restore(self, snapshot: dict[uuid.UUID, Entity]) -> None:
+    def restore(self, snapshot: dict[bytes, Entity]) -> None:
         raise RuntimeError('Failed to restore')
 
 
@@ -415,7 +479,7 @@ def test_FailedSnapshot_LogsWarning(
     caplog: pytest.LogCaptureFixture,
 ) -> None:
     class FailingSnapshotRepo(FakeRepo):
-        def checkpoint(self) -> dict[uuid.UUID, Entity]:
+        def checkpoint(self) -> dict[bytes, Entity]:
             raise RuntimeError('Snapshot failed')
 
     good_repo = FakeRepo()
@@ -460,3 +524,421 @@ def test_ManualRollback() -> None:
 
     assert first_repo.list_all() == []
     assert second_repo.list_all() == []
+
+
+def test_EmptyTransaction_RepositoryIsNotTouched() -> None:
+    repo = Mock(spec=FakeRepo)
+
+    with UnitOfWork(repo):
+        pass
+
+    repo.checkpoint.assert_not_called()
+    repo.commit.assert_not_called()
+
+
+def test_EmptyTransactionFails_RepositoryIsNotRestored() -> None:
+    repo = Mock(spec=FakeRepo)
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork(repo):
+            raise ValueError('Force rollback')
+
+    repo.checkpoint.assert_not_called()
+    repo.restore.assert_not_called()
+
+
+def test_SameRepoRegisteredTwice_SnapshotTakenOnce() -> None:
+    repo = Mock(wraps=FakeRepo())
+
+    with UnitOfWork(repo, repo) as uow:
+        uow.register_operation(lambda: repo.add(Entity()))
+
+    repo.checkpoint.assert_called_once()
+    repo.commit.assert_called_once()
+
+
+def test_UnitOfWork_HasNoInstanceDict() -> None:
+    uow = UnitOfWork()
+
+    assert not hasattr(uow, '__dict__')
+    assert isinstance(uow, AbstractContextManager)
+
+
+def test_RepoWithoutCommit_CommitOk() -> None:
+    entity = Entity()
+    repo = RepoWithoutCommit()
+
+    with UnitOfWork(repo) as uow:  # type: ignore[arg-type]
+        uow.register_operation(lambda: repo.add(entity))
+
+    assert repo.list_all() == [entity]
+
+
+def test_OperationWithUndo_RepositoryIsNotSnapshotted() -> None:
+    entity = Entity()
+    repo = Mock(wraps=FakeRepo())
+
+    with UnitOfWork(repo) as uow:
+        uow.register_operation(
+            lambda: repo.add(entity),
+            undo=lambda: repo.remove(entity),
+        )
+
+    repo.checkpoint.assert_not_called()
+    repo.add.assert_called_once_with(entity)
+    repo.commit.assert_called_once()
+
+
+def test_CommitFails_ExecutedOperationsUndoneInReverseOrder() -> None:
+    calls: list[str] = []
+
+    with pytest.raises(UnitOfWorkError, match='Commit failed, rolled back'):
+        with UnitOfWork() as uow:
+            uow.register_operation(
+                lambda: calls.append('do 1'),
+                undo=lambda: calls.append('undo 1'),
+            )
+            uow.register_operation(
+                lambda: calls.append('do 2'),
+                undo=lambda: calls.append('undo 2'),
+            )
+            uow.register_operation(
+                failing_operation,
+                undo=lambda: calls.append('undo 3'),
+            )
+
+    assert calls == ['do 1', 'do 2', 'undo 2', 'undo 1']
+
+
+def test_OperationsWithAndWithoutUndo_RollbackRestoresRepo() -> None:
+    original_entity = Entity()
+    repo = FakeRepo()
+    repo.add(original_entity)
+    entity = Entity()
+
+    with pytest.raises(UnitOfWorkError, match='Commit failed, rolled back'):
+        with UnitOfWork(repo) as uow:
+            uow.register_operation(
+                lambda: repo.add(entity),
+                undo=lambda: repo.remove(entity),
+            )
+            uow.register_operation(lambda: repo.add(Entity()))
+            uow.register_operation(failing_operation)
+
+    assert repo.list_all() == [original_entity]
+
+
+def test_ExceptionInContext_UndoIsNotCalled() -> None:
+    operation = Mock()
+    undo = Mock()
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork() as uow:
+            uow.register_operation(operation, undo=undo)
+            raise ValueError('Force rollback')
+
+    operation.assert_not_called()
+    undo.assert_not_called()
+
+
+def test_UndoFails_RaisesRollbackError() -> None:
+    undo = Mock(side_effect=RuntimeError('Failed to undo'))
+
+    with pytest.raises(RollbackError) as exc_info:
+        with UnitOfWork() as uow:
+            uow.register_operation(Mock(), undo=undo)
+            uow.register_operation(failing_operation)
+
+    assert exc_info.value.failures == [(undo, undo.side_effect)]
+
+
+def test_ResetAfterCommit_CanBeEnteredAgain() -> None:
+    repo = FakeRepo()
+    uow = UnitOfWork(repo)
+
+    with uow:
+        uow.register_operation(lambda: repo.add(Entity()))
+    uow.reset()
+    with uow:
+        uow.register_operation(lambda: repo.add(Entity()))
+
+    assert len(repo.list_all()) == 2
+
+
+def test_ResetWithRepositories_NewRepositoriesRolledBack() -> None:
+    first_repo = FakeRepo()
+    second_repo = FakeRepo()
+    uow = UnitOfWork(first_repo)
+
+    with uow:
+        uow.register_operation(lambda: first_repo.add(Entity()))
+    uow.reset(second_repo)
+    with pytest.raises(UnitOfWorkError, match='Commit failed, rolled back'):
+        with uow:
+            uow.register_operation(lambda: second_repo.add(Entity()))
+            uow.register_operation(lambda: second_repo.remove(Entity()))
+
+    assert len(first_repo.list_all()) == 1
+    assert second_repo.list_all() == []
+
+
+def test_ResetInContext_Raises() -> None:
+    with UnitOfWork() as uow:
+        match = 'Cannot reset in state.*IN_PROGRESS'
+        with pytest.raises(UnitOfWorkError, match=match):
+            uow.reset()
+
+
+def test_RestoreFails_LogsError(caplog: pytest.LogCaptureFixture) -> None:
+    repo = FailingToRestoreRepo()
+
+    with caplog.at_level(logging.ERROR):
+        with pytest.raises(RollbackError):
+            with UnitOfWork(repo) as uow:
+                uow.register_operation(lambda: repo.add(Entity()))
+                raise ValueError('Force rollback')
+
+    assert 'Failed to roll back' in caplog.text
+    assert 'Failed to restore' in caplog.text
+
+
+def test_MarkDirty_DirectChangesRolledBack() -> None:
+    original_entity = Entity()
+    repo = FakeRepo()
+    repo.add(original_entity)
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork(repo) as uow:
+            uow.mark_dirty()
+            repo.add(Entity())
+            raise ValueError('Force rollback')
+
+    assert repo.list_all() == [original_entity]
+
+
+def test_MarkDirtyWithoutOperations_RepositoryCommitted() -> None:
+    repo = Mock(wraps=FakeRepo())
+
+    with UnitOfWork(repo) as uow:
+        uow.mark_dirty()
+        uow.mark_dirty()
+
+    repo.checkpoint.assert_called_once()
+    repo.commit.assert_called_once()
+
+
+def test_MarkDirtyOutsideContext_Raises() -> None:
+    match = 'Cannot mark dirty in state.*INITIAL'
+    with pytest.raises(UnitOfWorkError, match=match):
+        UnitOfWork().mark_dirty()
+
+
+def test_CommitFails_OriginalErrorChainedWithTraceback() -> None:
+    with pytest.raises(UnitOfWorkError) as exc_info:
+        with UnitOfWork() as uow:
+            uow.register_operation(failing_operation)
+
+    cause = exc_info.value.__cause__
+    assert isinstance(cause, ValueError)
+    tb = cause.__traceback__
+    assert tb is not None
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    assert tb.tb_frame.f_code.co_name == 'failing_operation'
+
+
+def test_RepoCommitFails_AllOperationsUndone() -> None:
+    class FailingToCommitRepo(FakeRepo):
+        def commit(self) -> None:
+            raise RuntimeError('Failed to commit')
+
+    calls: list[str] = []
+    repo = FailingToCommitRepo()
+
+    with pytest.raises(UnitOfWorkError, match='Commit failed, rolled back'):
+        with UnitOfWork(repo) as uow:
+            uow.register_operation(
+                lambda: calls.append('do 1'),
+                undo=lambda: calls.append('undo 1'),
+            )
+            uow.register_operation(lambda: repo.add(Entity()))
+
+    assert calls == ['do 1', 'undo 1']
+    assert repo.list_all() == []
+
+
+def test_VersionedRepo_CommitOk() -> None:
+    entity = Entity()
+    repo = VersionedRepo()
+
+    with UnitOfWork(repo) as uow:
+        uow.register_operation(lambda: repo.add(entity))
+
+    assert repo.list_all() == [entity]
+
+
+def test_VersionedRepo_RewoundOnFailure() -> None:
+    original_entity = Entity()
+    good_repo = FakeRepo()
+    versioned_repo = VersionedRepo()
+    versioned_repo.add(original_entity)
+    failing_repo = FailingToAddRepo()
+
+    with pytest.raises(UnitOfWorkError, match='Commit failed, rolled back'):
+        with UnitOfWork(good_repo, versioned_repo, failing_repo) as uow:
+            uow.register_operation(lambda: good_repo.add(Entity()))
+            uow.register_operation(lambda: versioned_repo.add(Entity()))
+            uow.register_operation(lambda: failing_repo.add(Entity()))
+
+    assert good_repo.list_all() == []
+    assert versioned_repo.list_all() == [original_entity]
+
+
+def test_SeveralIoBoundRepos_RestoredInThreadPool() -> None:
+    first_repo = IoBoundRepo()
+    second_repo = IoBoundRepo()
+    cpu_repo = FakeRepo()
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork(first_repo, second_repo, cpu_repo) as uow:
+            uow.register_operation(lambda: first_repo.add(Entity()))
+            first_repo.add(Entity())
+            second_repo.add(Entity())
+            cpu_repo.add(Entity())
+            raise ValueError('Force rollback')
+
+    for repo in (first_repo, second_repo):
+        assert repo.list_all() == []
+        assert repo.restored_in is not None
+        assert repo.restored_in.startswith('unitofwork')
+    assert cpu_repo.list_all() == []
+
+
+def test_SingleIoBoundRepo_RestoredInCallingThread() -> None:
+    repo = IoBoundRepo()
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork(repo) as uow:
+            uow.register_operation(lambda: repo.add(Entity()))
+            raise ValueError('Force rollback')
+
+    assert repo.restored_in == threading.current_thread().name
+
+
+def test_IoBoundRepoFailsToRestore_RaisesRollbackError() -> None:
+    class FailingIoBoundRepo(IoBoundRepo):
+        def restore(self, snapshot: dict[bytes, Entity]) -> None:
+            raise RuntimeError('Failed to restore')
+
+    good_repo = IoBoundRepo()
+    bad_repo = FailingIoBoundRepo()
+
+    with pytest.raises(RollbackError) as exc_info:
+        with UnitOfWork(good_repo, bad_repo) as uow:
+            uow.register_operation(lambda: good_repo.add(Entity()))
+            good_repo.add(Entity())
+            raise ValueError('Force rollback')
+
+    assert [repo for repo, _ in exc_info.value.failures] == [bad_repo]
+    assert good_repo.list_all() == []
+
+
+def test_NoopOperationInContext_Skipped() -> None:
+    calls: list[str] = []
+    repo = Mock(wraps=FakeRepo())
+
+    noop_operation = NoopOperation(lambda: calls.append('noop'))
+
+    with UnitOfWork(repo) as uow:
+        uow.register_operation(noop_operation)
+
+    assert calls == []
+    repo.checkpoint.assert_not_called()
+
+
+def test_NoopOperationOutsideContext_Executed() -> None:
+    calls: list[str] = []
+
+    UnitOfWork().register_operation(NoopOperation(lambda: calls.append('x')))
+
+    assert calls == ['x']
+
+
+def test_RepoWithoutCheckpoint_LogsWarningAndOthersRestored(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    class RepoWithoutCheckpoint:
+        def restore(self, snapshot: object) -> None:
+            raise AssertionError('Must not be restored')
+
+    good_repo = FakeRepo()
+    bad_repo = RepoWithoutCheckpoint()
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork(good_repo, bad_repo) as uow:  # type: ignore[arg-type]
+            uow.register_operation(lambda: good_repo.add(Entity()))
+            good_repo.add(Entity())
+            raise ValueError('Force rollback')
+
+    assert 'Failed to take snapshot' in caplog.text
+    assert good_repo.list_all() == []
+
+
+def test_MockRepository_UsesCheckpointAndRestore() -> None:
+    repo = Mock()
+
+    with pytest.raises(ValueError, match='Force rollback'):
+        with UnitOfWork(repo) as uow:
+            uow.register_operation(lambda: None)
+            raise ValueError('Force rollback')
+
+    repo.checkpoint.assert_called_once_with()
+    repo.restore.assert_called_once_with(repo.checkpoint.return_value)
+    repo.version.assert_not_called()
+    repo.rewind_to.assert_not_called()
+
+
+def test_EmptyTransaction_DoesNotAccessRepositoryAttributes() -> None:
+    # Keeps an empty transaction as cheap as it was before snapshots
+    # became lazy: no method is looked up, let alone called
+    class UntouchableRepo:
+        def __getattribute__(self, name: str) -> Any:
+            raise AssertionError(f'Accessed {name}')
+
+    repos = [UntouchableRepo(), UntouchableRepo()]
+
+    with UnitOfWork(*repos):
+        pass
+
+
+def test_ManyReposWithRepeats_EachSnapshottedOnce() -> None:
+    repos = [Mock(wraps=FakeRepo()) for _ in range(10)]
+
+    with UnitOfWork(*repos, *repos) as uow:
+        uow.register_operation(lambda: None)
+
+    for repo in repos:
+        repo.checkpoint.assert_called_once()
+        repo.commit.assert_called_once()
+
+
+def test_NoRepositories_SnapshotsTakenOnce(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    take_snapshots = UnitOfWork._take_snapshots
+    calls: list[UnitOfWork] = []
+
+    def counting_take_snapshots(uow: UnitOfWork) -> None:
+        calls.append(uow)
+        take_snapshots(uow)
+
+    monkeypatch.setattr(UnitOfWork, '_take_snapshots', counting_take_snapshots)
+    results: list[int] = []
+
+    with UnitOfWork() as uow:
+        for _ in range(5):
+            uow.register_operation(lambda: results.append(1))
+        uow.mark_dirty()
+
+    assert len(calls) == 1
+    assert results == [1, 1, 1, 1, 1]